@@ -9,6 +9,7 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
+from reference_data import load_reference_tables, reference_checks
 
 # Function definitions
 def validate_column_type(df, column_name, expected_type):
@@ -184,6 +185,14 @@ validation_checks = {
     "CATALOGUING_LEVEL_type_check": (validate_column_type, 'CATALOGUING_LEVEL', str)
 }
 
+# Cross-column checks against the reference tables (hash join, loaded once and cached)
+reference_rules = {
+    "DESCRIPTOR_PROPERTY_reference_check": (['DESCRIPTOR', 'PROPERTY_TERM'], 'descriptor_properties'),
+    "PROPERTY_UOM_reference_check": (['PROPERTY_UOM'], 'uoms'),
+    "PLANT_reference_check": (['PLANT', 'ORG_PLANT_CODE'], 'plants'),
+}
+validation_checks.update(reference_checks(df, reference_rules, load_reference_tables()))
+
 validation_results = {}
 for check_name, (check_func, column, param) in validation_checks.items():
     if param is not None:
@@ -3,13 +3,15 @@ import pandas as pd
 import re
 import numbers
 from datetime import datetime
-import plotly.graph_objects as go
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
 import pyodbc
+from reference_data import load_reference_tables, reference_checks, normalise_keys
+from charts import gauge_chart, validation_chart
+from pipeline import csv_chunks, csv_parser, infer_csv_dtypes, sql_chunks, sql_parser, csv_writer, run_pipeline
 
 # Function definitions
 def validate_column_type(df, column_name, expected_type):
@@ -22,16 +24,6 @@ def validate_column_regex(df, column_name, regex):
 def validate_column_values_in_set(df, column_name, valid_set):
     return df[column_name].isin(valid_set)
 
-def calculate_total_validation_percentage(validation_results):
-    total_checks = len(validation_results)
-    total_passed = sum(result.all() for result in validation_results.values())
-    return (total_passed / total_checks) * 100
-
-def calculate_duplication_percentage(df, column_name):
-    duplicate_count = df.duplicated(subset=[column_name]).sum()
-    total_count = len(df)
-    return (duplicate_count / total_count) * 100
-
 def calculate_completeness(data):
     complete_entries = 0
     for index, row in data.iterrows():
@@ -92,7 +84,10 @@ data_source = st.sidebar.radio("Choose Data Source", ('Upload CSV', 'SQL Databas
 if data_source == 'Upload CSV':
     file_upload = st.sidebar.file_uploader("Choose a CSV file", type="csv")
     if file_upload is not None:
-        df = pd.read_csv(file_upload)
+        file_upload.seek(0)
+        # Parse every chunk with the whole-file dtypes so results match a single read
+        csv_dtypes = infer_csv_dtypes(file_upload)
+        source_stages = [('fetch', csv_chunks(file_upload)), ('parse', csv_parser(csv_dtypes))]
     else:
         st.sidebar.warning("Please upload a CSV file to proceed.")
         st.stop()
@@ -105,10 +100,12 @@ else:
     if st.sidebar.button("Fetch Data"):
         try:
             conn = pyodbc.connect(f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-            df = pd.read_sql(query, conn)
+            source_stages = [('fetch', sql_chunks(conn, query)), ('parse', sql_parser())]
         except Exception as e:
             st.sidebar.error(f"Error: {e}")
             st.stop()
+    else:
+        st.stop()
 
 # Perform validations and calculate stats
 validation_checks = {
@@ -130,33 +127,70 @@ validation_checks = {
     "MAND_EMPTY_check": (validate_column_regex, 'MAND_EMPTY', '^[a-zA-Z\\s]*$|^NULL$'),
 }
 
-validation_results = {}
-passed_counts = {}
-failed_counts = {}
-
-for check, (func, column, rule) in validation_checks.items():
-    validation_results[check] = func(df, column, rule)
-    passed_counts[check] = validation_results[check].sum()
-    failed_counts[check] = len(df) - passed_counts[check]
-
-total_rows = len(df)
+# Cross-column checks against the reference tables (hash join, loaded once and cached)
+reference_rules = {
+    "DESCRIPTOR_PROPERTY_reference_check": (['DESCRIPTOR_TERM', 'PROPERTY_TERM'], 'descriptor_properties'),
+    "PROPERTY_UOM_reference_check": (['PROPERTY_UOM'], 'uoms'),
+    "PLANT_reference_check": (['PLANT', 'ORG_PLANT_CODE'], 'plants'),
+}
+reference_tables = load_reference_tables()
+
+# Running totals over all chunks
+totals = {'rows': 0, 'passed': {}, 'all_passed': {}, 'complete': 0, 'duplicates': 0, 'pods': set(), 'preview': None}
+
+# Function to run the validation checks on one chunk (validate stage)
+def validate_chunk(chunk):
+    checks = dict(validation_checks)
+    checks.update(reference_checks(chunk, reference_rules, reference_tables))
+    results = {check: func(chunk, column, rule) for check, (func, column, rule) in checks.items()}
+    return chunk, results
+
+# Function to add a validated chunk to the running totals and keep its failed data points (aggregate stage)
+def aggregate_chunk(validated):
+    chunk, results = validated
+    totals['rows'] += len(chunk)
+    for check, result in results.items():
+        totals['passed'][check] = totals['passed'].get(check, 0) + result.sum()
+        totals['all_passed'][check] = totals['all_passed'].get(check, True) and bool(result.all())
+    totals['complete'] += calculate_completeness(chunk) * len(chunk) / 100
+    # PODs compared as normalised strings, so 7 and 7.0 match across chunks
+    pods = normalise_keys(chunk[['POD']])['POD']
+    totals['duplicates'] += (pods.duplicated() | pods.isin(totals['pods'])).sum()
+    totals['pods'].update(pods)
+    if totals['preview'] is None:
+        totals['preview'] = chunk.head()
+
+    failed = chunk.copy()
+    for check, result in results.items():
+        failed[check] = ~result
+    failed['Failed_Checks'] = failed.apply(lambda row: [check for check in results if row[check]], axis=1)
+    return failed[failed['Failed_Checks'].map(len) > 0]
+
+# Fetch, parse, validate, aggregate and export run concurrently, one chunk at a time per stage
+failed_data_file = "failed_data_points.csv"
+try:
+    pipeline_report = run_pipeline(source_stages + [
+        ('validate', validate_chunk),
+        ('aggregate', aggregate_chunk),
+        ('export', csv_writer(failed_data_file)),
+    ])
+except Exception as e:
+    st.error(f"Error: {e}")
+    st.stop()
+
+total_rows = totals['rows']
+if total_rows == 0:
+    st.warning("No data to validate.")
+    st.stop()
+
+passed_counts = totals['passed']
+failed_counts = {check: total_rows - count for check, count in passed_counts.items()}
 passed_percentage = {check: (count / total_rows) * 100 for check, count in passed_counts.items()}
 failed_percentage = {check: (count / total_rows) * 100 for check, count in failed_counts.items()}
 
-total_validation_percentage = calculate_total_validation_percentage(validation_results)
-pod_duplication_percentage = calculate_duplication_percentage(df, 'POD')
-completeness_percentage = calculate_completeness(df)
-
-# Collect failed data points for each validation check
-failed_data_points = df.copy()
-for check, result in validation_results.items():
-    failed_data_points[check] = ~result
-
-failed_data_points['Failed_Checks'] = failed_data_points.apply(
-    lambda row: [check for check in validation_checks.keys() if row[check]], axis=1
-)
-
-failed_data_points = failed_data_points[failed_data_points['Failed_Checks'].map(len) > 0]
+total_validation_percentage = (sum(totals['all_passed'].values()) / len(totals['all_passed'])) * 100
+pod_duplication_percentage = (totals['duplicates'] / total_rows) * 100
+completeness_percentage = (totals['complete'] / total_rows) * 100
 
 # Layout: Three main sections
 st.header("Statistics")
@@ -165,76 +199,38 @@ st.header("Statistics")
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    fig_gauge_validation = go.Figure(go.Indicator(
-        mode="gauge+number",
-        value=total_validation_percentage,
-        title={'text': "Total Validation Percentage"},
-        gauge={'axis': {'range': [None, 100]}}
-    ))
-    fig_gauge_validation.update_layout(width=300, height=300)
-    st.plotly_chart(fig_gauge_validation)
+    st.plotly_chart(gauge_chart(total_validation_percentage, "Total Validation Percentage"))
 
 st.markdown("<br>", unsafe_allow_html=True)  # Add space between gauges
 
 with col2:
-    fig_gauge_pod = go.Figure(go.Indicator(
-        mode="gauge+number",
-        value=pod_duplication_percentage,
-        title={'text': "POD Duplication Percentage"},
-        gauge={'axis': {'range': [None, 100]}}
-    ))
-    fig_gauge_pod.update_layout(width=300, height=300)
-    st.plotly_chart(fig_gauge_pod)
+    st.plotly_chart(gauge_chart(pod_duplication_percentage, "POD Duplication Percentage"))
 
 st.markdown("<br>", unsafe_allow_html=True)  # Add space between gauges
 
 with col3:
-    fig_gauge_completeness = go.Figure(go.Indicator(
-        mode="gauge+number",
-        value=completeness_percentage,
-        title={'text': "Completeness Percentage"},
-        gauge={'axis': {'range': [None, 100]}}
-    ))
-    fig_gauge_completeness.update_layout(width=300, height=300)
-    st.plotly_chart(fig_gauge_completeness)
+    st.plotly_chart(gauge_chart(completeness_percentage, "Completeness Percentage"))
 
 # Validation Results
 st.header("Validation Results")
 
-labels = list(passed_percentage.keys())
-passed = list(passed_percentage.values())
-failed = list(failed_percentage.values())
-
-fig_validation = go.Figure()
-fig_validation.add_trace(go.Bar(
-    y=labels,
-    x=passed,
-    name='Passed',
-    orientation='h',
-    marker_color='green'
-))
-fig_validation.add_trace(go.Bar(
-    y=labels,
-    x=failed,
-    name='Failed',
-    orientation='h',
-    marker_color='red'
-))
-
-fig_validation.update_layout(barmode='stack', title="Validation Results", xaxis_title="Percentage", yaxis_title="Validation Check")
-st.plotly_chart(fig_validation)
+st.plotly_chart(validation_chart(passed_percentage, failed_percentage))
+
+# Pipeline stage utilization; the busiest stage is the bottleneck
+with st.expander("Pipeline Stages"):
+    st.dataframe(pd.DataFrame(pipeline_report).T)
+    bottleneck = max(pipeline_report, key=lambda stage: pipeline_report[stage]['utilization'])
+    st.write(f"Bottleneck stage: {bottleneck}")
 
 # Data Preview
 st.header("Data Preview")
-st.dataframe(df.head())
+st.dataframe(totals['preview'])
 
 # Email section
 st.header("Send Failed Data Points via Email")
 recipient_email = st.text_input("Recipient Email")
 email_subject = st.text_input("Email Subject", "Failed Data Points")
 email_body = st.text_area("Email Body", "Please find attached the failed data points.")
-failed_data_file = "failed_data_points.csv"
-failed_data_points.to_csv(failed_data_file, index=False)
 
 if st.button("Send Email"):
     send_email(recipient_email, email_subject, email_body, failed_data_file)
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from reference_data import hash_frame
+
+# Most points sent to the browser per trace
+MAX_CHART_POINTS = 500
+
+# Number of chart specs kept; the oldest is dropped first
+FIGURE_CACHE_SIZE = 64
+
+# Built chart specs keyed by result hash, kept across Streamlit reruns
+_figure_cache = {}
+
+
+# Function to hash the values a chart is built from
+def result_hash(*values):
+    payload = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Function to return the cached chart spec for a key, building it on a miss
+def cached_figure(key, build):
+    spec = _figure_cache.get(key)
+    if spec is None:
+        spec = build().to_dict()
+        _figure_cache[key] = spec
+        if len(_figure_cache) > FIGURE_CACHE_SIZE:
+            del _figure_cache[next(iter(_figure_cache))]
+    return spec
+
+
+# Function to downsample a series with Largest-Triangle-Three-Buckets;
+# returns the positions of the points to keep (first and last always kept)
+def lttb(x, y, threshold):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        if i == threshold - 3:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            next_end = min(int((i + 2) * bucket_size) + 1, n)
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+
+# Function to average runs per day ('D') or week ('W')
+def bucket_history(history, columns, freq):
+    buckets = history.set_index('Timestamp')[columns].resample(freq).mean()
+    return buckets.dropna(how='all').reset_index()
+
+
+# Function to build the accuracy/completeness history figure. Runs are bucketed
+# by day or week when requested, otherwise each trace is reduced with LTTB.
+def history_figure(history, columns=('Accuracy', 'Completeness'), bucket=None, max_points=MAX_CHART_POINTS):
+    columns = list(columns)
+    fig = go.Figure()
+
+    # Runs saved before run dates were recorded have no Timestamp; they are only
+    # left out when grouping by day or week
+    timed = 'Timestamp' in history.columns and (bucket is not None or history['Timestamp'].notna().all())
+    if timed:
+        history = history.assign(Timestamp=pd.to_datetime(history['Timestamp'])).dropna(subset=['Timestamp'])
+        history = history.sort_values('Timestamp')
+        if bucket is not None:
+            history = bucket_history(history, columns, bucket)
+        x = history['Timestamp']
+        x_numeric = x.values.astype('datetime64[s]').astype(float)
+        xaxis_title = 'Run date'
+    else:
+        x = history['Filename'] if 'Filename' in history.columns else pd.Series(history.index)
+        x_numeric = np.arange(len(history), dtype=float)
+        xaxis_title = 'File'
+
+    for column in columns:
+        y = history[column].values.astype(float)
+        present = ~np.isnan(y)
+        positions = np.flatnonzero(present)[lttb(x_numeric[present], y[present], max_points)]
+        fig.add_trace(go.Scatter(x=x.iloc[positions], y=y[positions], mode='lines+markers', name=column))
+
+    fig.update_layout(title='Accuracy and Completeness Over Time', xaxis_title=xaxis_title, yaxis_title='Percentage')
+    return fig
+
+
+# Function to get the history chart spec, built once per history content, window and bucket
+def history_chart(history, bucket=None, max_points=MAX_CHART_POINTS):
+    key = ('history', hash_frame(history), bucket, max_points)
+    return cached_figure(key, lambda: history_figure(history, bucket=bucket, max_points=max_points))
+
+
+# Function to get a gauge chart spec
+def gauge_chart(value, title):
+    def build():
+        fig = go.Figure(go.Indicator(
+            mode="gauge+number",
+            value=value,
+            title={'text': title},
+            gauge={'axis': {'range': [None, 100]}}
+        ))
+        fig.update_layout(width=300, height=300)
+        return fig
+    return cached_figure(('gauge', result_hash(value, title)), build)
+
+
+# Function to get the stacked passed/failed bar chart spec
+def validation_chart(passed_percentage, failed_percentage):
+    def build():
+        labels = list(passed_percentage.keys())
+        fig = go.Figure()
+        fig.add_trace(go.Bar(
+            y=labels,
+            x=list(passed_percentage.values()),
+            name='Passed',
+            orientation='h',
+            marker_color='green'
+        ))
+        fig.add_trace(go.Bar(
+            y=labels,
+            x=list(failed_percentage.values()),
+            name='Failed',
+            orientation='h',
+            marker_color='red'
+        ))
+        fig.update_layout(barmode='stack', title="Validation Results", xaxis_title="Percentage", yaxis_title="Validation Check")
+        return fig
+    return cached_figure(('validation', result_hash(passed_percentage, failed_percentage)), build)
@@ -0,0 +1,375 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+from quality_checks import score_data, save_stats_to_excel, send_email
+
+# Defaults for settings missing from the monitor config file
+HISTORY_FILE = 'data_quality_stats.xlsx'
+METRICS_FILE = 'monitor_metrics.prom'
+SEEN_FILES_FILE = 'monitor_seen_files.json'
+REGRESSION_THRESHOLD = 5.0
+POLL_SECONDS = 30
+
+# Stats compared between runs: column -> direction of a regression (-1 drop, +1 rise)
+REGRESSION_METRICS = {'Accuracy': -1, 'Completeness': -1, 'Duplicated POD Percentage': 1}
+
+# Open database connections keyed by connection string, kept warm between runs
+_connections = {}
+
+logger = logging.getLogger('monitor')
+
+
+# Function to get a pooled connection; 'sqlite:///path' opens a local SQLite
+# database, anything else is passed to pyodbc as an ODBC connection string
+def get_connection(connection_string):
+    conn = _connections.get(connection_string)
+    if conn is None:
+        if connection_string.startswith('sqlite:///'):
+            conn = sqlite3.connect(connection_string[len('sqlite:///'):], check_same_thread=False)
+        else:
+            import pyodbc
+            conn = pyodbc.connect(connection_string)
+        _connections[connection_string] = conn
+    return conn
+
+
+# Function to drop a pooled connection, e.g. after the server closed it
+def close_connection(connection_string):
+    conn = _connections.pop(connection_string, None)
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# Allowed values of the five cron fields (minute hour day month weekday)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+# Function to expand one cron field ('*', '5', '1-5', '*/15', '0,30') into the
+# values it matches; names (MON, JAN) and out-of-range values raise ValueError
+def _cron_field_values(field, low, high):
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(bound) for bound in part.split('-'))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"{field!r} is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+# Function to check one cron field against a value
+def _cron_field_matches(field, value, low, high):
+    return value in _cron_field_values(field, low, high)
+
+
+# Function to check that a schedule is a cron expression the monitor supports,
+# raising ValueError otherwise (e.g. for '@daily' or 'MON')
+def validate_schedule(expression):
+    fields = expression.split()
+    if len(fields) != len(CRON_FIELDS):
+        raise ValueError(f"expected five fields (minute hour day month weekday), got {expression!r}")
+    for field, (low, high) in zip(fields, CRON_FIELDS):
+        try:
+            _cron_field_values(field, low, high)
+        except ValueError as e:
+            raise ValueError(f"unsupported field {field!r} in {expression!r}") from e
+
+
+# Function to check a five-field cron expression (minute hour day month weekday)
+# against a time; weekday 0 or 7 is Sunday. As in cron, when both day and
+# weekday are restricted either one matching is enough.
+def cron_matches(expression, moment):
+    minute, hour, day, month, weekday = expression.split()
+    cron_weekday = (moment.weekday() + 1) % 7
+    day_matches = _cron_field_matches(day, moment.day, 1, 31)
+    weekday_matches = (_cron_field_matches(weekday, cron_weekday, 0, 7)
+                       or (cron_weekday == 0 and _cron_field_matches(weekday, 7, 0, 7)))
+    if day != '*' and weekday != '*':
+        date_matches = day_matches or weekday_matches
+    else:
+        date_matches = day_matches and weekday_matches
+    return (_cron_field_matches(minute, moment.minute, 0, 59)
+            and _cron_field_matches(hour, moment.hour, 0, 23)
+            and _cron_field_matches(month, moment.month, 1, 12)
+            and date_matches)
+
+
+# Function to list the stats columns that regressed past the threshold
+# (in percentage points) since the previous run of the same job
+def find_regressions(previous, current, threshold=REGRESSION_THRESHOLD):
+    if previous is None:
+        return []
+    regressions = []
+    for column, direction in REGRESSION_METRICS.items():
+        change = (current[column] - previous[column]) * direction
+        if change > threshold:
+            regressions.append((column, previous[column], current[column]))
+    return regressions
+
+
+# Function to load the last stats of each job from the history store
+def load_last_stats(history_file, jobs):
+    try:
+        history = pd.read_excel(history_file)
+    except FileNotFoundError:
+        return {}
+    last_stats = {}
+    for job in jobs:
+        name = job['name']
+        rows = history[(history['Filename'] == name) | history['Filename'].astype(str).str.startswith(name + '/')]
+        if len(rows) > 0:
+            last_stats[name] = rows.iloc[-1].to_dict()
+    return last_stats
+
+
+# Function to load the drop files already scored by each job: job -> {path: modification time}
+def load_seen_files(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+# Function to save the scored drop files, so restarts and --once runs skip them
+# (via a temp file and os.replace, so a crash never leaves half a file)
+def save_seen_files(state, path=SEEN_FILES_FILE):
+    with state['lock']:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state['seen_files'], f, indent=2)
+        os.replace(tmp_path, path)
+
+
+# Function to load the data a job scores: (label, DataFrame, file) for its SQL
+# query (file is None), or for each new or changed file in its drop folder.
+# Files are only marked as seen by run_job once they were scored, and a
+# file that cannot be read yet (e.g. still being copied) is retried next run.
+def load_job_data(job, state):
+    if 'query' in job:
+        try:
+            data = pd.read_sql(job['query'], get_connection(job['connection']))
+        except Exception:
+            # The pooled connection may have gone stale; reconnect once
+            close_connection(job['connection'])
+            data = pd.read_sql(job['query'], get_connection(job['connection']))
+        yield job['name'], data, None
+        return
+
+    seen = state['seen_files'].setdefault(job['name'], {})
+    for path in sorted(glob.glob(os.path.join(job['folder'], job.get('pattern', '*.csv')))):
+        modified = os.path.getmtime(path)
+        if seen.get(path) == modified:
+            continue
+        try:
+            data = pd.read_csv(path)
+        except Exception:
+            logger.warning("Could not read %s; retrying next run", path, exc_info=True)
+            continue
+        yield f"{job['name']}/{os.path.basename(path)}", data, (path, modified)
+
+
+# Function to email the regression report with the invalid entries attached
+def send_report(job, config, stats, regressions, invalid_data):
+    lines = [f"Data quality regressed for {stats['Filename']} at {stats['Timestamp']:%Y-%m-%d %H:%M}:"]
+    for column, previous, current in regressions:
+        lines.append(f"{column}: {previous:.2f}% -> {current:.2f}%")
+    smtp = config.get('smtp', {})
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp:
+        pass
+    try:
+        invalid_data.to_csv(tmp.name, index=False)
+        for recipient in job.get('recipients', config.get('recipients', [])):
+            send_email(recipient, f"Data quality regression: {job['name']}", '\n'.join(lines), tmp.name, **smtp)
+    finally:
+        os.remove(tmp.name)
+
+
+# Function to score one dataset of a job, persist the stats and alert on regressions
+def score_job_data(job, config, state, label, data):
+    threshold = job.get('regression_threshold', config.get('regression_threshold', REGRESSION_THRESHOLD))
+    stats, valid_data, invalid_data = score_data(data, label)
+    save_stats_to_excel(stats, config.get('history_file', HISTORY_FILE))
+    with state['lock']:
+        previous = state['last_stats'].get(job['name'])
+        state['last_stats'][job['name']] = stats
+    regressions = find_regressions(previous, stats, threshold)
+    if regressions:
+        send_report(job, config, stats, regressions, invalid_data)
+        with state['lock']:
+            state['metrics']['alerts'][job['name']] = state['metrics']['alerts'].get(job['name'], 0) + 1
+
+
+# Function to run one job. A drop file that fails scoring (e.g. a missing
+# column) is logged, counted as a failure and marked as seen at its current
+# modification time, so it does not block later files and is retried once it changes.
+def run_job(job, config, state):
+    for label, data, file in load_job_data(job, state):
+        if file is None:
+            score_job_data(job, config, state, label, data)
+            continue
+        try:
+            score_job_data(job, config, state, label, data)
+        except Exception:
+            logger.exception("Scoring %s failed; skipping it until it changes", label)
+            with state['lock']:
+                state['metrics']['failures'][job['name']] = state['metrics']['failures'].get(job['name'], 0) + 1
+        path, modified = file
+        with state['lock']:
+            state['seen_files'][job['name']][path] = modified
+        save_seen_files(state, config.get('seen_files_file', SEEN_FILES_FILE))
+
+
+# Function to write the metrics in Prometheus text format (for a textfile collector)
+def write_metrics(state, path=METRICS_FILE):
+    with state['lock']:
+        metrics = state['metrics']
+        lines = [
+            '# TYPE dq_monitor_queue_depth gauge',
+            f"dq_monitor_queue_depth {state['queue'].qsize()}",
+        ]
+        for name, metric_type, values in (
+            ('dq_monitor_run_seconds', 'gauge', metrics['latency']),
+            ('dq_monitor_runs_total', 'counter', metrics['runs']),
+            ('dq_monitor_failures_total', 'counter', metrics['failures']),
+            ('dq_monitor_alerts_total', 'counter', metrics['alerts']),
+        ):
+            lines.append(f'# TYPE {name} {metric_type}')
+            lines.extend(f'{name}{{job="{job}"}} {value}' for job, value in values.items())
+        # Written under the lock: the scheduler and the worker share the temp file
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+
+# Function to build the shared monitor state; fails fast on a schedule the
+# scheduler could not evaluate, naming the job
+def create_state(config):
+    for job in config['jobs']:
+        try:
+            validate_schedule(job.get('schedule', ''))
+        except ValueError as e:
+            raise ValueError(f"Job {job['name']!r} has an invalid schedule: {e}") from None
+    return {
+        'lock': threading.Lock(),
+        'queue': queue.Queue(),
+        'queued': set(),
+        'seen_files': load_seen_files(config.get('seen_files_file', SEEN_FILES_FILE)),
+        'last_stats': load_last_stats(config.get('history_file', HISTORY_FILE), config['jobs']),
+        'metrics': {'latency': {}, 'runs': {}, 'failures': {}, 'alerts': {}},
+    }
+
+
+# Function run by the worker thread: takes due jobs off the queue one at a time
+def work(config, state, stop):
+    jobs = {job['name']: job for job in config['jobs']}
+    metrics_file = config.get('metrics_file', METRICS_FILE)
+    while not stop.is_set():
+        try:
+            name = state['queue'].get(timeout=1)
+        except queue.Empty:
+            continue
+        start = time.perf_counter()
+        try:
+            run_job(jobs[name], config, state)
+            failed = False
+        except Exception:
+            logger.exception("Job %s failed", name)
+            failed = True
+        try:
+            with state['lock']:
+                state['queued'].discard(name)
+                metrics = state['metrics']
+                metrics['latency'][name] = time.perf_counter() - start
+                metrics['runs'][name] = metrics['runs'].get(name, 0) + 1
+                if failed:
+                    metrics['failures'][name] = metrics['failures'].get(name, 0) + 1
+            write_metrics(state, metrics_file)
+        except Exception:
+            logger.exception("Writing metrics failed")
+        finally:
+            # Always mark the job done so run_once's queue.join() cannot hang
+            state['queue'].task_done()
+
+
+# Function to queue a job unless it is already waiting or running
+def enqueue(state, name):
+    with state['lock']:
+        if name in state['queued']:
+            return
+        state['queued'].add(name)
+    state['queue'].put(name)
+
+
+# Function to run the scheduler: every minute that passes, queue the jobs whose
+# schedule matches it; a worker thread runs them so the queue depth stays visible
+def run_monitor(config, stop=None):
+    stop = stop or threading.Event()
+    state = create_state(config)
+    worker = threading.Thread(target=work, args=(config, state, stop), daemon=True)
+    worker.start()
+
+    metrics_file = config.get('metrics_file', METRICS_FILE)
+    last_minute = datetime.now().replace(second=0, microsecond=0)
+    while not stop.wait(config.get('poll_seconds', POLL_SECONDS)):
+        now = datetime.now().replace(second=0, microsecond=0)
+        while last_minute < now:
+            last_minute += timedelta(minutes=1)
+            for job in config['jobs']:
+                if cron_matches(job['schedule'], last_minute):
+                    enqueue(state, job['name'])
+        write_metrics(state, metrics_file)
+
+    worker.join()
+    return state
+
+
+# Function to run every job once, in order, without the scheduler
+def run_once(config):
+    state = create_state(config)
+    stop = threading.Event()
+    for job in config['jobs']:
+        enqueue(state, job['name'])
+    worker = threading.Thread(target=work, args=(config, state, stop), daemon=True)
+    worker.start()
+    state['queue'].join()
+    stop.set()
+    worker.join()
+    return state
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-score configured SQL queries and drop folders on a schedule.")
+    parser.add_argument('config', help="JSON monitor config file")
+    parser.add_argument('--once', action='store_true', help="run every job once and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.config) as f:
+        monitor_config = json.load(f)
+    if args.once:
+        run_once(monitor_config)
+    else:
+        run_monitor(monitor_config)
@@ -0,0 +1,216 @@
+import io
+import queue
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# Rows per chunk read from a CSV file or SQL cursor
+CHUNK_ROWS = 50000
+
+# Chunks buffered between two stages; a full queue blocks the stage before it
+QUEUE_SIZE = 4
+
+# Marks the end of the chunk stream between stages
+_DONE = object()
+
+
+# Function to read raw CSV records in chunks of rows (fetch stage). A record
+# continues over line breaks while it has an odd number of quotes, so quoted
+# newlines stay inside their record.
+def csv_chunks(file, chunk_rows=CHUNK_ROWS):
+    header = file.readline()
+    records = []
+    record = b''
+    for line in iter(file.readline, b''):
+        record += line
+        if record.count(b'"') % 2 == 0:
+            records.append(record)
+            record = b''
+            if len(records) == chunk_rows:
+                yield header + b''.join(records)
+                records = []
+    if record:
+        records.append(record)
+    if records:
+        yield header + b''.join(records)
+
+
+# Function to merge the dtypes pandas inferred for one column in different
+# chunks into the dtype it infers when parsing all rows at once
+def merge_dtypes(dtypes):
+    unique = set(dtypes)
+    if len(unique) == 1:
+        return unique.pop()
+    if all(pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_float_dtype(dtype) for dtype in unique):
+        return np.dtype('float64')
+    return np.dtype(object)
+
+
+# Function to classify a parsed CSV column: None when it is all blanks (which
+# fit any dtype), bool for an object column holding only booleans and blanks
+def _csv_column_kind(series):
+    if series.isna().all():
+        return None
+    if series.dtype == object and series.dropna().map(type).eq(bool).all():
+        return np.dtype(bool)
+    return series.dtype
+
+
+# Function to infer the whole-file dtype of CSV columns (schema pass), so
+# validation results do not depend on where chunk boundaries fall. Returns only
+# the columns whose chunks disagree: numbers are read as float, and any other
+# mix as strings, which is what a single read of the whole file gives.
+def infer_csv_dtypes(file, chunk_rows=CHUNK_ROWS):
+    start = file.tell()
+    kinds = {}
+    for chunk in pd.read_csv(file, chunksize=chunk_rows):
+        for column in chunk.columns:
+            kinds.setdefault(column, set()).add(_csv_column_kind(chunk[column]))
+    file.seek(start)
+    dtypes = {}
+    for column, column_kinds in kinds.items():
+        present = column_kinds - {None}
+        if len(present) > 1:
+            dtypes[column] = merge_dtypes(present)
+        elif None in column_kinds and present and pd.api.types.is_integer_dtype(next(iter(present))):
+            # Integers with blanks elsewhere in the file are read as float
+            dtypes[column] = np.dtype('float64')
+    return dtypes
+
+
+# Function to parse raw CSV chunks into DataFrames with fixed dtypes (parse stage)
+def csv_parser(dtype=None):
+    def parse(raw):
+        return pd.read_csv(io.BytesIO(raw), dtype=dtype)
+    return parse
+
+
+# Function to fetch query results in chunks of rows (fetch stage)
+def sql_chunks(conn, query, chunk_rows=CHUNK_ROWS):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query)
+        columns = [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield columns, rows
+    finally:
+        cursor.close()
+
+
+# Function to turn fetched blocks of SQL rows into DataFrames (parse stage).
+# Query results cannot be scanned twice, so each column keeps the dtype merged
+# over the chunks seen so far and later chunks are cast to it.
+def sql_parser():
+    dtypes = {}
+
+    def parse(block):
+        columns, rows = block
+        chunk = pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+        for column, dtype in chunk.dtypes.items():
+            dtypes[column] = merge_dtypes([dtypes.get(column, dtype), dtype])
+            if dtypes[column] != dtype:
+                chunk[column] = chunk[column].astype(dtypes[column])
+        return chunk
+    return parse
+
+
+# Function to write chunks to one CSV file, header first (export stage)
+def csv_writer(path):
+    state = {'first': True}
+
+    def write(chunk):
+        chunk.to_csv(path, mode='w' if state['first'] else 'a', header=state['first'], index=False)
+        state['first'] = False
+        return chunk
+    return write
+
+
+# Queue helpers that give up once another stage has failed
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+# Function to run one stage in its own thread, timing busy, waiting (input
+# queue empty) and blocked (output queue full, i.e. backpressure) periods
+def _run_stage(func, inbox, outbox, stats, stop, errors):
+    try:
+        chunks = iter(func) if inbox is None else None
+        while True:
+            start = time.perf_counter()
+            if inbox is None:
+                item = next(chunks, _DONE)
+                stats['busy'] += time.perf_counter() - start
+            else:
+                item = _get(inbox, stop)
+                stats['waiting'] += time.perf_counter() - start
+            if item is _DONE:
+                break
+            if inbox is not None:
+                start = time.perf_counter()
+                item = func(item)
+                stats['busy'] += time.perf_counter() - start
+            stats['chunks'] += 1
+            if outbox is not None:
+                start = time.perf_counter()
+                if not _put(outbox, item, stop):
+                    break
+                stats['blocked'] += time.perf_counter() - start
+                stats['max_queue'] = max(stats['max_queue'], outbox.qsize())
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        if outbox is not None:
+            _put(outbox, _DONE, stop)
+
+
+# Function to run stages concurrently with bounded queues between them, so
+# chunk k+1 is fetched while chunk k is validated and chunk k-1 is written.
+# stages is a list of (name, func); the first func is an iterable of chunks,
+# every later one is called on each chunk and its result passed downstream.
+# Returns per-stage statistics; utilization is busy time over wall time and
+# the stage with the highest utilization is the bottleneck.
+def run_pipeline(stages, queue_size=QUEUE_SIZE):
+    stop = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages[:-1]]
+    report = {}
+    threads = []
+
+    for i, (name, func) in enumerate(stages):
+        report[name] = {'chunks': 0, 'busy': 0.0, 'waiting': 0.0, 'blocked': 0.0, 'max_queue': 0}
+        inbox = queues[i - 1] if i > 0 else None
+        outbox = queues[i] if i < len(queues) else None
+        threads.append(threading.Thread(target=_run_stage, args=(func, inbox, outbox, report[name], stop, errors), daemon=True))
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    if errors:
+        raise errors[0]
+    for stats in report.values():
+        stats['utilization'] = stats['busy'] / wall * 100 if wall > 0 else 0
+    return report
@@ -0,0 +1,182 @@
+import pandas as pd
+from datetime import datetime
+from openpyxl import load_workbook
+import smtplib
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.mime.base import MIMEBase
+from email import encoders
+from reference_data import load_reference_tables, reference_checks
+from validation_planner import PLANNER_STATS_FILE, column_check, classify_rows, attribute_failures, load_check_stats, save_check_stats, update_check_stats
+
+# Define validation rules
+def is_integer(value):
+    return pd.api.types.is_integer_dtype(value)
+
+def is_string(value):
+    return pd.api.types.is_string_dtype(value)
+
+def is_numeric_or_null(value):
+    return pd.isnull(value) or pd.api.types.is_numeric_dtype(value)
+
+def is_string_or_null(value):
+    return pd.isnull(value) or pd.api.types.is_string_dtype(value)
+
+def is_valid_mand_ind(value):
+    return value in ['Y', 'N']
+
+def is_present(value):
+    return pd.notnull(value)
+
+def is_in_predefined_set(value, predefined_set):
+    # None means membership is checked by a reference table join instead
+    return predefined_set is None or value in predefined_set
+
+# Cross-column reference rules: check name -> (data columns, reference table)
+reference_rules = {
+    'PROPERTY_UOM_reference_check': (['PROPERTY_UOM'], 'uoms'),
+    'SUGGESTED_UOM_reference_check': (['SUGGESTED_UOM'], 'uoms'),
+    'DESCR_PROPERTY_reference_check': (['DESCR', 'PROPERTY_TERM'], 'descriptor_properties'),
+    'PLANT_reference_check': (['PLANT', 'ORG_PLANT_CODE'], 'plants'),
+}
+
+# Function to build the row checks (plus the reference rules) for the planner
+def build_row_checks(data, reference_tables=None):
+    predefined_uoms = {'MILLIMETER', 'AMPERE', 'VOLT'}
+    predefined_uom_rules = {'RULE1', 'RULE2'}
+    predefined_data_type_rules = {'NUMERIC', 'STRING'}
+    predefined_data_types = {'MEASURED_NUMBER'}
+
+    if reference_tables is None:
+        reference_tables = load_reference_tables()
+    if 'uoms' in reference_tables:
+        # UOMs come from the reference table, checked by the reference rules
+        predefined_uoms = None
+
+    checks = {
+        'CORP_NO_check': column_check('CORP_NO', is_integer),
+        'ERP_NO_check': column_check('ERP_NO', is_integer),
+        'DESCR_check': column_check('DESCR', is_string),
+        'PROPERTY_TERM_check': column_check('PROPERTY_TERM', lambda x: is_string(x) and is_present(x)),
+        'PROPERTY_VALUE_check': column_check('PROPERTY_VALUE', is_numeric_or_null),
+        'CLEAN_PROPERTY_VALUE_check': column_check('CLEAN_PROPERTY_VALUE', is_numeric_or_null),
+        'EXTRA_DETAILS_check': column_check('EXTRA_DETAILS', is_string_or_null),
+        'PROP_FFT_check': column_check('PROP_FFT', is_string_or_null),
+        'PROPERTY_UOM_check': column_check('PROPERTY_UOM', lambda x: is_string(x) and is_in_predefined_set(x, predefined_uoms)),
+        'SUGGESTED_UOM_check': column_check('SUGGESTED_UOM', lambda x: is_string(x) and is_in_predefined_set(x, predefined_uoms)),
+        'UOM_RULES_check': column_check('UOM_RULES', lambda x: is_string(x) and is_in_predefined_set(x, predefined_uom_rules)),
+        'DATA_TYPE_RULES_check': column_check('DATA_TYPE_RULES', lambda x: is_string(x) and is_in_predefined_set(x, predefined_data_type_rules)),
+        'DATA_TYPE_check': column_check('DATA_TYPE', lambda x: is_string(x) and is_in_predefined_set(x, predefined_data_types)),
+        'ORIGINATING_PLANT_TRM_check': column_check('ORIGINATING_PLANT_TRM', is_string),
+        'ORIGINATING_DIVISION_check': column_check('ORIGINATING_DIVISION', is_string),
+        'PLANT_GROUP_check': column_check('PLANT_GROUP', is_string),
+        'MAND_IND_check': column_check('MAND_IND', lambda x: is_valid_mand_ind(x) and is_present(x)),
+        'MAND_EMPTY_check': column_check('MAND_EMPTY', is_string_or_null),
+        'CLEAN_PROPERTY_UOM_check': column_check('CLEAN_PROPERTY_UOM', is_string_or_null),
+    }
+    for check, (func, columns, reference_index) in reference_checks(data, reference_rules, reference_tables).items():
+        checks[check] = (columns, lambda frame, func=func, columns=columns, reference_index=reference_index: func(frame, columns, reference_index).values)
+    return checks
+
+# Function to validate data: the planner runs the cheapest, most selective checks
+# first and only evaluates later checks on rows that are still undecided
+def validate_data(data, reference_tables=None, stats_file=PLANNER_STATS_FILE):
+    checks = build_row_checks(data, reference_tables)
+    stats = load_check_stats(stats_file)
+    valid, run_stats = classify_rows(data, checks, stats)
+    save_check_stats(update_check_stats(stats, run_stats), stats_file)
+    return data[valid.values], data[~valid.values]
+
+# Function to list every failed check per row (explicit, evaluates all checks on all rows)
+def validate_data_with_attribution(data, reference_tables=None):
+    failures = attribute_failures(data, build_row_checks(data, reference_tables))
+    failed_checks = failures.apply(lambda row: [check for check in failures.columns if row[check]], axis=1)
+    return failures, failed_checks
+
+# Function to calculate completeness based on new rules
+def calculate_completeness(data):
+    complete_entries = 0
+    for index, row in data.iterrows():
+        property_value = row['PROPERTY_VALUE']
+        property_uom = row['PROPERTY_UOM']
+        data_type_rules = row['DATA_TYPE_RULES']
+        
+        if pd.api.types.is_numeric_dtype(property_value) and pd.notnull(property_uom) and data_type_rules == 'NUMERIC':
+            complete_entries += 1
+        elif pd.api.types.is_string_dtype(property_value) and pd.isnull(property_uom) and data_type_rules == 'STRING':
+            complete_entries += 1
+    
+    completeness = (complete_entries / len(data)) * 100 if len(data) > 0 else 0
+    return completeness
+
+# Function to calculate percentage of duplicated PODs
+def calculate_duplicated_pod(data):
+    if 'POD' in data.columns:
+        total_pods = data['POD'].shape[0]
+        duplicated_pods = data['POD'].duplicated().sum()
+        duplicated_percentage = (duplicated_pods / total_pods) * 100 if total_pods > 0 else 0
+        return duplicated_percentage
+    return 0
+
+# Function to validate data and calculate the statistics saved to the history
+def score_data(data, filename):
+    valid_data, invalid_data = validate_data(data)
+    total_entries = len(data)
+    stats = {
+        'Filename': filename,
+        'Total Entries': total_entries,
+        'Valid Entries': len(valid_data),
+        'Invalid Entries': len(invalid_data),
+        'Accuracy': (len(valid_data) / total_entries) * 100 if total_entries > 0 else 0,
+        'Completeness': calculate_completeness(data),
+        'Duplicated POD Percentage': calculate_duplicated_pod(data),
+        'Timestamp': datetime.now()
+    }
+    return stats, valid_data, invalid_data
+
+# Function to save stats to Excel
+def save_stats_to_excel(stats, filename="data_quality_stats.xlsx"):
+    try:
+        book = load_workbook(filename)
+    except FileNotFoundError:
+        pd.DataFrame([stats]).to_excel(filename, index=False)
+        return
+    sheet = book['Sheet1']
+    header = [cell.value for cell in sheet[1]]
+    # Histories written before a column existed (e.g. Timestamp) get its header cell
+    for column in stats:
+        if column not in header:
+            header.append(column)
+            sheet.cell(row=1, column=len(header), value=column)
+    sheet.append([stats.get(column) for column in header])
+    book.save(filename)
+
+# Function to send email with attachment
+# (from_password=None skips TLS and login, e.g. for a local SMTP stand-in)
+def send_email(to_email, subject, body, attachment_path, smtp_host='smtp.gmail.com', smtp_port=587,
+               from_email="your_email@example.com",  # Replace with your email
+               from_password="your_password"):  # Replace with your email password
+
+    msg = MIMEMultipart()
+    msg['From'] = from_email
+    msg['To'] = to_email
+    msg['Subject'] = subject
+
+    msg.attach(MIMEText(body, 'plain'))
+
+    attachment = open(attachment_path, "rb")
+
+    part = MIMEBase('application', 'octet-stream')
+    part.set_payload((attachment).read())
+    encoders.encode_base64(part)
+    part.add_header('Content-Disposition', "attachment; filename= " + attachment_path)
+
+    msg.attach(part)
+
+    server = smtplib.SMTP(smtp_host, smtp_port)
+    if from_password:
+        server.starttls()
+        server.login(from_email, from_password)
+    text = msg.as_string()
+    server.sendmail(from_email, to_email, text)
+    server.quit()
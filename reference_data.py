@@ -0,0 +1,95 @@
+import hashlib
+import os
+import pandas as pd
+
+# Folder holding the reference tables (valid UOMs, properties per descriptor, plant codes)
+REFERENCE_DIR = os.environ.get('DQ_REFERENCE_DIR', 'reference')
+
+# Reference tables: name -> (CSV file in REFERENCE_DIR, key columns)
+REFERENCE_TABLES = {
+    'uoms': ('uoms.csv', ['UOM']),
+    'descriptor_properties': ('descriptor_properties.csv', ['DESCRIPTOR_TERM', 'PROPERTY_TERM']),
+    'plants': ('plants.csv', ['PLANT', 'ORG_PLANT_CODE']),
+}
+
+# Loaded reference indexes keyed by source: source -> (content hash, index).
+# Lives at module level so it survives Streamlit reruns of the app scripts.
+_reference_cache = {}
+
+
+# Function to hash a file's content without loading it all at once
+def hash_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to hash a DataFrame's content (e.g. the run history behind a chart)
+def hash_frame(df):
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+# Function to bring key columns to a comparable form: stripped strings,
+# whole-number floats without the trailing '.0', nulls kept as nulls
+def normalise_keys(frame):
+    def normalise(series):
+        if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+            series = series.astype('Int64')
+        return series.astype(str).str.strip().where(series.notna())
+    return frame.apply(normalise)
+
+
+# Function to build the hashed lookup index for a reference table
+def build_reference_index(ref_df, columns):
+    keys = normalise_keys(ref_df[columns]).dropna().drop_duplicates()
+    if len(columns) == 1:
+        return pd.Index(keys[columns[0]])
+    return pd.MultiIndex.from_frame(keys)
+
+
+# Function to load a reference CSV, reusing the cached index while its content is unchanged
+def load_reference_table(path, columns):
+    content_hash = hash_file(path)
+    cached = _reference_cache.get(path)
+    if cached is not None and cached[0] == content_hash:
+        return cached[1]
+    ref_df = pd.read_csv(path, usecols=columns, dtype=str)
+    index = build_reference_index(ref_df, columns)
+    _reference_cache[path] = (content_hash, index)
+    return index
+
+
+# Function to load every reference table present in the reference folder
+def load_reference_tables(reference_dir=REFERENCE_DIR):
+    tables = {}
+    for name, (filename, columns) in REFERENCE_TABLES.items():
+        path = os.path.join(reference_dir, filename)
+        if os.path.exists(path):
+            tables[name] = load_reference_table(path, columns)
+    return tables
+
+
+# Function to check a column (or column pair) against a reference index with a
+# vectorized hash join: one get_indexer call instead of a per-cell `in` test
+def validate_columns_in_reference(df, columns, reference_index):
+    if isinstance(columns, str):
+        columns = [columns]
+    keys = normalise_keys(df[columns])
+    if len(columns) == 1:
+        lookup = pd.Index(keys[columns[0]])
+    else:
+        lookup = pd.MultiIndex.from_frame(keys)
+    return pd.Series(reference_index.get_indexer(lookup) >= 0, index=df.index)
+
+
+# Function to pick the reference rules that can run on this data:
+# rules maps check name -> (data columns, reference table name)
+def reference_checks(df, rules, reference_tables):
+    checks = {}
+    for check, (columns, table) in rules.items():
+        if table in reference_tables and all(column in df.columns for column in columns):
+            checks[check] = (validate_columns_in_reference, columns, reference_tables[table])
+    return checks
@@ -0,0 +1,200 @@
+import email
+import os
+import socketserver
+import sqlite3
+import tempfile
+import threading
+import pandas as pd
+import pytest
+import monitor
+import quality_checks
+from validation_planner import column_check
+
+
+# Minimal SMTP stand-in: accepts every message without TLS or login and keeps it
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line + b'\r\n')
+
+    def handle(self):
+        self.reply(b'220 localhost')
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.strip().upper()
+            if command.startswith(b'RCPT TO'):
+                recipients.append(line.split(b':', 1)[1].strip().strip(b'<>').decode())
+                self.reply(b'250 OK')
+            elif command == b'DATA':
+                self.reply(b'354 End data with <CR><LF>.<CR><LF>')
+                data = b''
+                for data_line in iter(self.rfile.readline, b'.\r\n'):
+                    data += data_line
+                self.server.messages.append((recipients, email.message_from_bytes(data)))
+                recipients = []
+                self.reply(b'250 OK')
+            elif command == b'QUIT':
+                self.reply(b'221 Bye')
+                return
+            else:
+                self.reply(b'250 localhost')
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _SMTPHandler)
+    server.messages = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch, smtp_server):
+    # Planner statistics and reference tables are looked up in the working directory
+    monkeypatch.chdir(tmp_path)
+    # The built-in column rules reject every row, so score with a single rule
+    # whose accuracy the tests control: CORP_NO must be positive
+    monkeypatch.setattr(quality_checks, 'build_row_checks',
+                        lambda data, reference_tables=None: {'CORP_NO_check': column_check('CORP_NO', lambda x: x > 0)})
+    connection = f"sqlite:///{tmp_path / 'dq.db'}"
+    yield {
+        'history_file': str(tmp_path / 'history.xlsx'),
+        'metrics_file': str(tmp_path / 'monitor_metrics.prom'),
+        'seen_files_file': str(tmp_path / 'monitor_seen_files.json'),
+        'regression_threshold': 5.0,
+        'smtp': {'smtp_host': '127.0.0.1', 'smtp_port': smtp_server.server_address[1],
+                 'from_email': 'monitor@example.com', 'from_password': None},
+        'jobs': [{'name': 'changes', 'schedule': '0 6 * * *', 'connection': connection,
+                  'query': 'SELECT * FROM CHANGES', 'recipients': ['team@example.com']}],
+    }
+    monitor.close_connection(connection)
+
+
+# Function to replace the CHANGES table with rows of which `invalid` fail the rule
+def write_changes(config, rows, invalid):
+    path = config['jobs'][0]['connection'][len('sqlite:///'):]
+    data = pd.DataFrame({
+        'CORP_NO': [-1] * invalid + [1] * (rows - invalid),
+        'PROPERTY_VALUE': [1.0] * rows,
+        'PROPERTY_UOM': ['VOLT'] * rows,
+        'DATA_TYPE_RULES': ['NUMERIC'] * rows,
+        'POD': range(rows),
+    })
+    with sqlite3.connect(path) as conn:
+        data.to_sql('CHANGES', conn, index=False, if_exists='replace')
+
+
+def test_first_run_does_not_alert(config, smtp_server):
+    write_changes(config, 10, 0)
+    monitor.run_once(config)
+
+    history = pd.read_excel(config['history_file'])
+    assert list(history['Filename']) == ['changes']
+    assert history['Accuracy'].iloc[-1] == 100
+    assert smtp_server.messages == []
+
+
+def test_drop_below_threshold_does_not_alert(config, smtp_server):
+    write_changes(config, 25, 0)
+    monitor.run_once(config)
+    write_changes(config, 25, 1)
+    monitor.run_once(config)
+
+    history = pd.read_excel(config['history_file'])
+    assert list(history['Accuracy']) == [100, 96]
+    assert smtp_server.messages == []
+
+
+def test_accuracy_drop_past_threshold_sends_one_email(config, smtp_server, tmp_path, monkeypatch):
+    # The attachment's temp file must be removed once the report is sent
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path / 'tmp'))
+    (tmp_path / 'tmp').mkdir()
+    write_changes(config, 10, 0)
+    monitor.run_once(config)
+    write_changes(config, 10, 5)
+    state = monitor.run_once(config)
+
+    assert len(smtp_server.messages) == 1
+    recipients, message = smtp_server.messages[0]
+    assert recipients == ['team@example.com']
+    assert message['Subject'] == 'Data quality regression: changes'
+    assert 'Accuracy: 100.00% -> 50.00%' in message.get_payload()[0].get_payload()
+    assert state['metrics']['alerts'] == {'changes': 1}
+    assert list((tmp_path / 'tmp').iterdir()) == []
+
+
+def test_metrics_file_has_latency_runs_and_queue_depth(config):
+    write_changes(config, 10, 0)
+    monitor.run_once(config)
+
+    with open(config['metrics_file']) as f:
+        lines = f.read().splitlines()
+    assert 'dq_monitor_queue_depth 0' in lines
+    assert 'dq_monitor_runs_total{job="changes"} 1' in lines
+    assert any(line.startswith('dq_monitor_run_seconds{job="changes"} ') for line in lines)
+
+
+@pytest.fixture
+def drop_config(config, tmp_path):
+    (tmp_path / 'incoming').mkdir()
+    config['jobs'] = [{'name': 'drop', 'schedule': '*/15 * * * *', 'folder': str(tmp_path / 'incoming'),
+                       'recipients': ['team@example.com']}]
+    return config
+
+
+# Function to write a drop file with `rows` valid rows
+def write_drop_file(config, filename, rows):
+    path = f"{config['jobs'][0]['folder']}/{filename}"
+    pd.DataFrame({
+        'CORP_NO': [1] * rows,
+        'PROPERTY_VALUE': [1.0] * rows,
+        'PROPERTY_UOM': ['VOLT'] * rows,
+        'DATA_TYPE_RULES': ['NUMERIC'] * rows,
+        'POD': range(rows),
+    }).to_csv(path, index=False)
+    return path
+
+
+def test_failing_drop_file_does_not_block_later_files(drop_config):
+    path = write_drop_file(drop_config, 'a.csv', 10)
+    pd.read_csv(path).drop(columns='CORP_NO').to_csv(path, index=False)
+    write_drop_file(drop_config, 'b.csv', 10)
+    state = monitor.run_once(drop_config)
+
+    history = pd.read_excel(drop_config['history_file'])
+    assert list(history['Filename']) == ['drop/b.csv']
+    assert state['metrics']['failures'] == {'drop': 1}
+    assert sorted(state['seen_files']['drop']) == [path, f"{drop_config['jobs'][0]['folder']}/b.csv"]
+
+
+def test_scored_drop_files_are_skipped_by_the_next_run(drop_config):
+    write_drop_file(drop_config, 'a.csv', 10)
+    monitor.run_once(drop_config)
+    write_drop_file(drop_config, 'b.csv', 10)
+    monitor.run_once(drop_config)
+
+    history = pd.read_excel(drop_config['history_file'])
+    assert list(history['Filename']) == ['drop/a.csv', 'drop/b.csv']
+
+
+def test_changed_drop_file_is_scored_again(drop_config):
+    path = write_drop_file(drop_config, 'a.csv', 10)
+    monitor.run_once(drop_config)
+    modified = os.path.getmtime(path)
+    os.utime(path, (modified + 60, modified + 60))
+    monitor.run_once(drop_config)
+
+    history = pd.read_excel(drop_config['history_file'])
+    assert list(history['Filename']) == ['drop/a.csv', 'drop/a.csv']
+
+
+@pytest.mark.parametrize('schedule', ['0 6 * * MON', '0 6 1 JAN *', '@daily', '0 25 * * *'])
+def test_unsupported_schedule_fails_at_start_naming_the_job(config, schedule):
+    config['jobs'][0]['schedule'] = schedule
+    with pytest.raises(ValueError, match="Job 'changes' has an invalid schedule"):
+        monitor.create_state(config)
@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# File keeping per-check failure rates and costs observed in previous runs
+PLANNER_STATS_FILE = 'validation_planner_stats.json'
+
+# Weight kept by older runs when new observations are merged in
+STATS_DECAY = 0.5
+
+
+# Function to turn a per-value predicate into a planner check on one column.
+# A check is (columns it reads, function(frame) -> boolean array of passing rows).
+def column_check(column, predicate):
+    return ([column], lambda frame: frame[column].map(predicate).astype(bool).values)
+
+
+# Function to load the statistics of previous runs
+def load_check_stats(path=PLANNER_STATS_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+# Function to save the statistics for the next run
+# (via a temp file and os.replace, so a concurrent reader never sees half a file)
+def save_check_stats(stats, path=PLANNER_STATS_FILE):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(stats, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# Function to merge one run's observations into the stored statistics,
+# decaying older runs so the order follows changes in the data
+def update_check_stats(stats, run_stats, decay=STATS_DECAY):
+    updated = dict(stats)
+    for check, observed in run_stats.items():
+        previous = stats.get(check, {'rows': 0, 'failed': 0, 'seconds': 0.0})
+        updated[check] = {key: previous[key] * decay + observed[key] for key in ('rows', 'failed', 'seconds')}
+    return updated
+
+
+# Function to order checks so the cheapest, most selective ones run first.
+# Rank is cost per row divided by failure rate (expected seconds spent per
+# rejected row); checks never seen before run first to collect statistics.
+def order_checks(checks, stats):
+    def rank(check):
+        observed = stats.get(check)
+        if not observed or observed['rows'] == 0:
+            return 0.0
+        failure_rate = observed['failed'] / observed['rows']
+        if failure_rate == 0:
+            return float('inf')
+        return (observed['seconds'] / observed['rows']) / failure_rate
+    return sorted(checks, key=rank)
+
+
+# Function to classify rows as valid or invalid with early exit: each check only
+# sees the rows every earlier check passed, and evaluation stops once no
+# undecided rows are left. Returns the validity mask and this run's statistics.
+def classify_rows(data, checks, stats=None):
+    undecided = np.arange(len(data))
+    valid = np.ones(len(data), dtype=bool)
+    run_stats = {}
+
+    for check in order_checks(checks, stats or {}):
+        if len(undecided) == 0:
+            break
+        columns, func = checks[check]
+        frame = data.iloc[undecided, data.columns.get_indexer(columns)]
+        start = time.perf_counter()
+        passed = np.asarray(func(frame), dtype=bool)
+        elapsed = time.perf_counter() - start
+
+        valid[undecided[~passed]] = False
+        run_stats[check] = {'rows': len(undecided), 'failed': int((~passed).sum()), 'seconds': elapsed}
+        undecided = undecided[passed]
+
+    return pd.Series(valid, index=data.index), run_stats
+
+
+# Function to evaluate every check on every row (full per-check attribution).
+# Slower than classify_rows; returns one column per check, True where the row failed.
+def attribute_failures(data, checks):
+    failures = {}
+    for check, (columns, func) in checks.items():
+        failures[check] = ~np.asarray(func(data[columns]), dtype=bool)
+    return pd.DataFrame(failures, index=data.index)